@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Orquestrador de release do WebSim Arduino
+Executa as etapas do release (zip da plataforma, builds do webuploader, tarball,
+checksums e atualização dos índices) como um grafo de dependências, em paralelo,
+pulando etapas cujas entradas não mudaram.
+python release.py
+python release.py --jobs 4 --force
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from package_update_json import WebSimPlatformUpdater
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOL_DIR = os.path.join(ROOT_DIR, 'tools', 'webuploader')
+
+STATE_FILE = os.path.join(ROOT_DIR, '.release-state.json')
+
+PLATFORM_NAME = 'WebSim AVR Boards'
+PLATFORM_VERSION = '0.1.2'
+TOOL_NAME = 'webuploader'
+TOOL_VERSION = '1.2.0'
+
+INDEX_FILE = 'package_websim_arduino_index.json'
+INDEX_LOCAL_FILE = 'package_websim_arduino_index_local.json'
+
+# Alvos de cross-compile do webuploader: (GOOS, GOARCH, binário)
+GO_TARGETS = [
+    ('linux', 'amd64', 'webuploader-linux'),
+    ('windows', 'amd64', 'webuploader.exe'),
+    ('darwin', 'amd64', 'webuploader-macos-intel'),
+    ('darwin', 'arm64', 'webuploader-macos-arm64'),
+]
+
+
+_print_lock = threading.Lock()
+
+
+def log(message: str):
+    """
+    Imprime uma linha sem misturar a saída de etapas paralelas
+    """
+    with _print_lock:
+        print(message, flush=True)
+
+
+def load_tool_updater() -> Any:
+    """
+    Carrega WebSimJSONUpdater de tools/webuploader/scripts/update_package.py
+    sem gerar __pycache__ dentro de scripts/ (que é copiado para o tarball)
+
+    Returns:
+        Classe WebSimJSONUpdater
+    """
+    module_path = os.path.join(TOOL_DIR, 'scripts', 'update_package.py')
+    spec = importlib.util.spec_from_file_location('update_package', module_path)
+    module = importlib.util.module_from_spec(spec)
+
+    dont_write_bytecode = sys.dont_write_bytecode
+    sys.dont_write_bytecode = True
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.dont_write_bytecode = dont_write_bytecode
+    return module.WebSimJSONUpdater
+
+
+def hash_file(file_path: str, hash_obj: Optional[Any] = None) -> Any:
+    """
+    Atualiza (ou cria) um hash sha256 com o conteúdo de um arquivo
+
+    Args:
+        file_path (str): Caminho do arquivo
+        hash_obj: Objeto hashlib a ser atualizado (opcional)
+
+    Returns:
+        Objeto hashlib atualizado
+    """
+    if hash_obj is None:
+        hash_obj = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b""):
+            hash_obj.update(chunk)
+    return hash_obj
+
+
+class Step:
+    def __init__(self, name: str, action: Callable[['Step'], Any], deps: Optional[List[str]] = None,
+                 inputs: Optional[List[str]] = None, outputs: Optional[List[str]] = None,
+                 params: Optional[Dict[str, Any]] = None):
+        """
+        Etapa do release
+
+        Args:
+            name (str): Nome único da etapa
+            action (callable): Função executada; recebe a etapa e retorna um resultado serializável em JSON
+            deps (list): Nomes das etapas das quais esta depende
+            inputs (list): Arquivos de entrada, usados no fingerprint
+            outputs (list): Arquivos gerados; a etapa é refeita se algum não existir
+            params (dict): Parâmetros que também entram no fingerprint (versão, GOOS, etc.)
+        """
+        self.name = name
+        self.action = action
+        self.deps = deps or []
+        self.inputs = inputs or []
+        self.outputs = outputs or []
+        self.params = params or {}
+        self.result = None
+        self.fingerprint = None
+        self.output_hashes: Dict[str, str] = {}
+        self.stale = False
+
+    def compute_fingerprint(self, dep_fingerprints: List[str]) -> str:
+        """
+        Calcula o fingerprint da etapa a partir do conteúdo das entradas,
+        dos parâmetros e dos fingerprints das dependências
+
+        Returns:
+            str: Hash sha256 em hexadecimal
+        """
+        hash_obj = hashlib.sha256()
+        hash_obj.update(json.dumps(self.params, sort_keys=True).encode('utf-8'))
+        for fingerprint in dep_fingerprints:
+            hash_obj.update(fingerprint.encode('utf-8'))
+        for file_path in sorted(self.inputs):
+            hash_obj.update(os.path.relpath(file_path, ROOT_DIR).encode('utf-8'))
+            hash_file(file_path, hash_obj)
+        return hash_obj.hexdigest()
+
+
+class ReleaseOrchestrator:
+    def __init__(self, jobs: int, force: bool = False, dry_run: bool = False):
+        """
+        Inicializa o orquestrador
+
+        Args:
+            jobs (int): Número de workers do pool
+            force (bool): Refazer todas as etapas, ignorando o estado salvo
+            dry_run (bool): Apenas mostrar o plano de execução
+        """
+        self.jobs = jobs
+        self.force = force
+        self.dry_run = dry_run
+        self.steps: Dict[str, Step] = {}
+        self.state: Dict[str, Any] = {}
+
+    def add(self, step: Step):
+        """
+        Adiciona uma etapa ao grafo
+        """
+        for dep in step.deps:
+            if dep not in self.steps:
+                raise ValueError(f"Etapa '{step.name}' depende de '{dep}', que não foi definida")
+        self.steps[step.name] = step
+
+    def load_state(self):
+        """
+        Carrega os fingerprints e resultados da última execução
+        """
+        if self.force or not os.path.exists(STATE_FILE):
+            return
+        try:
+            with open(STATE_FILE, 'r', encoding='utf-8') as file:
+                self.state = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Ignorando estado inválido ({e})")
+            self.state = {}
+
+    def save_state(self):
+        """
+        Salva os fingerprints e resultados das etapas concluídas
+        """
+        with open(STATE_FILE, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file, indent=2)
+
+    def is_up_to_date(self, step: Step) -> bool:
+        """
+        Verifica se a etapa pode ser pulada: mesmo fingerprint e saídas com o mesmo
+        conteúdo gerado na última execução (ex.: índice restaurado com git checkout)
+        """
+        saved = self.state.get(step.name)
+        if not saved or saved.get('fingerprint') != step.fingerprint:
+            return False
+        if not all(os.path.isfile(output) for output in step.outputs):
+            return False
+        return saved.get('outputs') == self.hash_outputs(step)
+
+    def hash_outputs(self, step: Step) -> Dict[str, str]:
+        """
+        Calcula o sha256 de cada saída da etapa
+        """
+        return {
+            os.path.relpath(output, ROOT_DIR): hash_file(output).hexdigest()
+            for output in step.outputs
+        }
+
+    def run_step(self, step: Step) -> Step:
+        """
+        Executa uma etapa (ou reaproveita o resultado salvo) no pool de workers
+        """
+        # No dry-run as saídas das dependências pendentes ainda não existem
+        if self.dry_run and any(self.steps[dep].stale for dep in step.deps):
+            step.stale = True
+            log(f"📝 {step.name}: seria executado")
+            return step
+
+        step.fingerprint = step.compute_fingerprint([self.steps[dep].fingerprint for dep in step.deps])
+
+        if self.is_up_to_date(step):
+            step.result = self.state[step.name].get('result')
+            step.output_hashes = self.state[step.name].get('outputs', {})
+            log(f"⏭️  {step.name}: atualizado, pulando")
+            return step
+
+        if self.dry_run:
+            step.stale = True
+            log(f"📝 {step.name}: seria executado")
+            return step
+
+        start = time.monotonic()
+        log(f"🏗️  {step.name}: executando...")
+        step.result = step.action(step)
+        step.output_hashes = self.hash_outputs(step)
+        log(f"✅ {step.name}: concluído em {time.monotonic() - start:.1f}s")
+        return step
+
+    def run(self) -> bool:
+        """
+        Executa o grafo: cada etapa é enviada ao pool assim que suas dependências terminam
+
+        Returns:
+            bool: True se todas as etapas foram concluídas, False caso contrário
+        """
+        self.load_state()
+
+        pending = dict(self.steps)
+        done = set()
+        running = {}
+        failed = False
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                if not failed:
+                    for name, step in list(pending.items()):
+                        if all(dep in done for dep in step.deps):
+                            running[pool.submit(self.run_step, step)] = step
+                            del pending[name]
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        log(f"❌ {step.name}: {e}")
+                        failed = True
+                        continue
+                    done.add(step.name)
+                    if not self.dry_run:
+                        self.state[step.name] = {
+                            'fingerprint': step.fingerprint,
+                            'result': step.result,
+                            'outputs': step.output_hashes,
+                        }
+
+        if not self.dry_run:
+            self.save_state()
+
+        if failed or pending:
+            print(f"❌ Release interrompido. Etapas não executadas: {', '.join(sorted(pending)) or '-'}")
+            return False
+        return True
+
+
+def walk_tree(directory: str) -> List[str]:
+    """
+    Lista diretórios e arquivos (incluindo os ocultos) de uma árvore, cada
+    diretório antes do seu conteúdo, como o `zip -r`
+
+    Args:
+        directory (str): Raiz da árvore
+
+    Returns:
+        Caminhos em ordem determinística
+    """
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        entries.append(dirpath)
+        entries.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+    return entries
+
+
+def zip_platform(step: Step) -> None:
+    """
+    Gera o zip da plataforma (equivalente a `zip -r websim-avr-X.zip websim-avr`:
+    mesmas entradas de diretório e arquivos ocultos)
+    """
+    zip_path = step.outputs[0]
+    tmp_path = f"{zip_path}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path in walk_tree(step.params['source']):
+            archive.write(path, os.path.relpath(path, ROOT_DIR))
+    os.replace(tmp_path, zip_path)
+
+
+def go_build(step: Step) -> None:
+    """
+    Cross-compile do webuploader para um GOOS/GOARCH (mesmos flags do `make release`)
+    """
+    env = dict(os.environ, GOOS=step.params['goos'], GOARCH=step.params['goarch'])
+    ldflags = f"-s -w -X main.version={step.params['version']} -X main.buildType=release"
+    sources = sorted(glob.glob(os.path.join(TOOL_DIR, 'src', '*.go')))
+    os.makedirs(os.path.dirname(step.outputs[0]), exist_ok=True)
+    subprocess.run(['go', 'build', f'-ldflags={ldflags}', '-o', step.outputs[0]] + sources,
+                   cwd=TOOL_DIR, env=env, check=True)
+
+
+def tar_tool(step: Step) -> None:
+    """
+    Monta dist/webuploader e gera o tarball (equivalente ao `make dist`)
+    """
+    dist_dir = os.path.join(TOOL_DIR, 'dist')
+    package_dir = os.path.join(dist_dir, TOOL_NAME)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.makedirs(package_dir)
+    for file_path in step.inputs:
+        shutil.copy2(file_path, package_dir)
+
+    tar_path = step.outputs[0]
+    tmp_path = f"{tar_path}.tmp"
+    with tarfile.open(tmp_path, 'w:gz') as archive:
+        archive.add(dist_dir, arcname='.')
+    os.replace(tmp_path, tar_path)
+
+
+def file_info(step: Step) -> Dict[str, str]:
+    """
+    Calcula size e checksum (formato do índice) do arquivo de entrada
+    """
+    file_path = step.inputs[0]
+    return {
+        'size': str(os.path.getsize(file_path)),
+        'checksum': f"SHA-256:{hash_file(file_path).hexdigest()}",
+    }
+
+
+def update_indexes(orchestrator: ReleaseOrchestrator) -> Callable[[Step], None]:
+    """
+    Cria a etapa final que aplica todas as atualizações de cada índice e salva uma única vez
+    """
+    def action(step: Step) -> None:
+        platform = orchestrator.steps['hash-platform'].result
+        tool = orchestrator.steps['hash-tool'].result
+
+        WebSimJSONUpdater = load_tool_updater()
+
+        # O índice publicado só recebe a plataforma; o local também recebe a ferramenta
+        for json_file in step.outputs:
+            updater = WebSimPlatformUpdater(json_file)
+            if not updater.load_json():
+                raise RuntimeError(f"não foi possível carregar {json_file}")
+            if not updater.update_platform_values(PLATFORM_NAME, platform['size'], platform['checksum']):
+                raise RuntimeError(f"plataforma '{PLATFORM_NAME}' não encontrada em {json_file}")
+            if os.path.basename(json_file) == INDEX_LOCAL_FILE:
+                tool_updater = WebSimJSONUpdater(json_file)
+                tool_updater.data = updater.data
+                if not tool_updater.update_tool_values(TOOL_NAME, tool['size'], tool['checksum']):
+                    raise RuntimeError(f"ferramenta '{TOOL_NAME}' não encontrada em {json_file}")
+            if not updater.save_json():
+                raise RuntimeError(f"não foi possível salvar {json_file}")
+
+    return action
+
+
+def build_graph(orchestrator: ReleaseOrchestrator, platform_version: str, tool_version: str):
+    """
+    Define as etapas do release e suas dependências
+    """
+    platform_dir = os.path.join(ROOT_DIR, 'websim-avr')
+    platform_files = [path for path in walk_tree(platform_dir) if os.path.isfile(path)]
+    go_inputs = sorted(glob.glob(os.path.join(TOOL_DIR, 'src', '**', '*.go'), recursive=True)) + [
+        os.path.join(TOOL_DIR, 'go.mod'),
+        os.path.join(TOOL_DIR, 'go.sum'),
+    ]
+    zip_path = os.path.join(ROOT_DIR, f"websim-avr-{platform_version}.zip")
+    tar_path = os.path.join(TOOL_DIR, f"{TOOL_NAME}-{tool_version}.tar.gz")
+
+    orchestrator.add(Step('zip-platform', zip_platform, inputs=platform_files, outputs=[zip_path],
+                          params={'version': platform_version, 'source': platform_dir}))
+    orchestrator.add(Step('hash-platform', file_info, deps=['zip-platform'], inputs=[zip_path]))
+
+    binaries = []
+    for goos, goarch, binary in GO_TARGETS:
+        output = os.path.join(TOOL_DIR, 'bin', binary)
+        binaries.append(output)
+        orchestrator.add(Step(f'go-build-{goos}-{goarch}', go_build, inputs=go_inputs, outputs=[output],
+                              params={'goos': goos, 'goarch': goarch, 'version': tool_version}))
+
+    # Só arquivos, como o `cp scripts/*` do make dist (ignora __pycache__ e afins)
+    dist_files = [os.path.join(TOOL_DIR, 'README.md')] + sorted(
+        file_path for file_path in glob.glob(os.path.join(TOOL_DIR, 'scripts', '*'))
+        if os.path.isfile(file_path)
+    ) + binaries
+    orchestrator.add(Step('tar-tool', tar_tool, deps=[f'go-build-{goos}-{goarch}' for goos, goarch, _ in GO_TARGETS],
+                          inputs=dist_files, outputs=[tar_path], params={'version': tool_version}))
+    orchestrator.add(Step('hash-tool', file_info, deps=['tar-tool'], inputs=[tar_path]))
+
+    # As entradas são os resultados dos hashes (via dependências), não o conteúdo dos índices,
+    # que é alterado pela própria etapa
+    orchestrator.add(Step('update-indexes', update_indexes(orchestrator), deps=['hash-platform', 'hash-tool'],
+                          outputs=[os.path.join(ROOT_DIR, INDEX_LOCAL_FILE), os.path.join(ROOT_DIR, INDEX_FILE)]))
+
+
+def main():
+    """
+    Função principal com argumentos da linha de comando
+    """
+    parser = argparse.ArgumentParser(
+        description='Gera o release do WebSim Arduino (plataforma + webuploader) em paralelo',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos de uso:
+  %(prog)s                       # Release completo, pulando etapas atualizadas
+  %(prog)s --force               # Refaz todas as etapas
+  %(prog)s --dry-run             # Mostra o que seria executado
+  %(prog)s --jobs 2              # Limita o número de etapas simultâneas
+        """
+    )
+
+    parser.add_argument('--platform-version',
+                       default=PLATFORM_VERSION,
+                       help=f'Versão da plataforma (padrão: {PLATFORM_VERSION})')
+
+    parser.add_argument('--tool-version',
+                       default=TOOL_VERSION,
+                       help=f'Versão do webuploader (padrão: {TOOL_VERSION})')
+
+    parser.add_argument('--jobs', '-j',
+                       type=int,
+                       default=max(len(GO_TARGETS) + 1, os.cpu_count() or 1),
+                       help='Número de etapas executadas em paralelo '
+                            '(padrão: número de CPUs, mínimo 5 para o zip rodar junto dos builds Go)')
+
+    parser.add_argument('--force',
+                       action='store_true',
+                       help='Ignorar o estado salvo e refazer todas as etapas')
+
+    parser.add_argument('--dry-run',
+                       action='store_true',
+                       help='Apenas mostrar as etapas que seriam executadas')
+
+    args = parser.parse_args()
+
+    orchestrator = ReleaseOrchestrator(max(1, args.jobs), force=args.force, dry_run=args.dry_run)
+    build_graph(orchestrator, args.platform_version, args.tool_version)
+
+    start = time.monotonic()
+    if not orchestrator.run():
+        sys.exit(1)
+    print(f"\n✅ Release concluído em {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ import (
 
 type WebSocketClient struct {
 	serverPort int
+	// deltaUpload is enabled when the server advertises FEATURE_DELTA_UPLOAD
+	deltaUpload bool
 }
 
 func NewWebSocketClient(port int) *WebSocketClient {
@@ -55,10 +57,21 @@ func (c *WebSocketClient) SendFile(filePath string, board string) error {
 	// Send websim.json if it exists
 	c.sendWebsimJson(filePath, conn)
 
+	// Send only the changed flash pages when the server has our last image for this board
+	sentDelta := false
+	if c.deltaUpload && board != "" {
+		sentDelta, err = c.sendDelta(conn, board, fileData)
+		if err != nil {
+			return err
+		}
+	}
+
 	// Send file data
-	err = conn.WriteMessage(websocket.BinaryMessage, fileData)
-	if err != nil {
-		return fmt.Errorf("failed to send file: %v", err)
+	if !sentDelta {
+		err = conn.WriteMessage(websocket.BinaryMessage, fileData)
+		if err != nil {
+			return fmt.Errorf("failed to send file: %v", err)
+		}
 	}
 
 	fmt.Printf("[ide] board: (%s)\n", board)
@@ -72,12 +85,89 @@ func (c *WebSocketClient) SendFile(filePath string, board string) error {
 		if err != nil {
 			break
 		}
+
+		var reply ControlMessage
+		if json.Unmarshal(message, &reply) == nil {
+			switch {
+			case reply.Action == "delta-result" && !reply.Ok:
+				// Server could not apply the delta, fall back to the full image
+				fmt.Printf("[ide] delta rejected (%s), sending full image\n", reply.Error)
+				err = conn.WriteMessage(websocket.BinaryMessage, fileData)
+				if err != nil {
+					return fmt.Errorf("failed to send file: %v", err)
+				}
+				continue
+			case reply.Action == "upload-result" && reply.Ok:
+				// The server relayed this image, it is the base for the next delta
+				if board != "" {
+					saveBoardImage(board, fileData)
+				}
+			}
+		}
+
 		fmt.Printf("[ide] received: %s\n", string(message))
 	}
 
 	return nil
 }
 
+// sendDelta runs the checksum handshake for a board and, when the server holds the
+// same base image as our local cache, sends only the changed flash pages.
+// Returns false when the full image must be sent instead.
+func (c *WebSocketClient) sendDelta(conn *websocket.Conn, board string, fileData []byte) (bool, error) {
+	image, err := ParseIntelHex(fileData)
+	if err != nil {
+		return false, nil
+	}
+
+	base := loadBoardImage(board)
+	if base == nil {
+		return false, nil
+	}
+
+	query, _ := json.Marshal(ControlMessage{Action: "delta-query", Board: board})
+	err = conn.WriteMessage(websocket.TextMessage, query)
+	if err != nil {
+		return false, fmt.Errorf("failed to send delta query: %v", err)
+	}
+
+	for {
+		_, message, err := conn.ReadMessage()
+		if err != nil {
+			return false, fmt.Errorf("failed to read delta reply: %v", err)
+		}
+
+		var reply ControlMessage
+		if json.Unmarshal(message, &reply) != nil || reply.Action != "delta-base" {
+			fmt.Printf("[ide] received: %s\n", string(message))
+			continue
+		}
+
+		if reply.Checksum != base.Checksum() {
+			return false, nil
+		}
+		break
+	}
+
+	frame, header, err := EncodeDeltaFrame(board, base, image)
+	if err != nil {
+		return false, nil
+	}
+
+	// Not worth it when the delta is not smaller than the hex file it replaces
+	if len(frame) >= len(fileData) {
+		return false, nil
+	}
+
+	err = conn.WriteMessage(websocket.BinaryMessage, frame)
+	if err != nil {
+		return false, fmt.Errorf("failed to send delta: %v", err)
+	}
+
+	fmt.Printf("[ide] delta upload: %d/%d pages changed\n", len(header.Pages), (len(image.Data)+FLASH_PAGE_SIZE-1)/FLASH_PAGE_SIZE)
+	return true, nil
+}
+
 func (c *WebSocketClient) SendDebugInfo(message string) error {
 	// Create WebSocket connection
 	u := url.URL{Scheme: "ws", Host: fmt.Sprintf("localhost:%d", c.serverPort), Path: "/", RawQuery: "from=cli"}
@@ -77,6 +77,26 @@ func GetBreakpoints(hexFile string) ([]ObjSourceMap, error) {
 	buildFolder := filepath.Dir(hexFile)
 	boardOptions := filepath.Join(buildFolder, "build.options.json")
 
+	// Read the DWARF line table directly, avr-objdump is only a fallback.
+	// Entries come in line table order, as avr-objdump -WL printed them.
+	elfFile := filepath.Join(buildFolder, strings.Replace(filepath.Base(hexFile), ".hex", ".elf", 1))
+	sourceMap, err := LoadSourceMap(elfFile)
+	if err == nil {
+		var inoBreaks []ObjSourceMap
+		for _, item := range sourceMap.ObjSourceMaps() {
+			if strings.HasSuffix(item.File, ".ino") {
+				inoBreaks = append(inoBreaks, item)
+			}
+		}
+
+		err = GrabLineSources(&inoBreaks)
+		if err != nil {
+			log.Printf("Warning: failed to grab line sources: %v", err)
+		}
+		return inoBreaks, nil
+	}
+	log.Printf("Warning: failed to read source map from %s: %v", elfFile, err)
+
 	// Get AVR path
 	avrPath, err := getAvrPath(boardOptions)
 	if err != nil {
@@ -188,32 +208,41 @@ func ParseObjDumpWL(fileDumpTxt string) ([]ObjSourceMap, error) {
 	return list, nil
 }
 
-// GrabLineSources fills the LineSource field for each item in the dump list
+// GrabLineSources fills the LineSource field for each item in the dump list.
+// Each source file is read once, up to the last line referenced.
 func GrabLineSources(dumpList *[]ObjSourceMap) error {
-	var currentFile string
-	var lines []string
+	lineNums := make(map[string][]int)
 
-	for i := range *dumpList {
-		item := &(*dumpList)[i]
-		
+	for _, item := range *dumpList {
 		if strings.HasSuffix(item.File, ".ino") {
-			if item.File != currentFile {
-				data, err := ioutil.ReadFile(item.File)
-				if err != nil {
-					continue // Skip if file can't be read
-				}
-				lines = strings.Split(string(data), "\n")
-				currentFile = item.File
-			}
-
 			lineNum, err := strconv.Atoi(item.LineNumber)
-			if err != nil || lineNum < 1 || lineNum > len(lines) {
+			if err != nil || lineNum < 1 {
 				continue
 			}
+			lineNums[item.File] = append(lineNums[item.File], lineNum)
+		}
+	}
 
-			item.LineSource = lines[lineNum-1]
+	sources := make(map[string]map[int]string, len(lineNums))
+	for file, nums := range lineNums {
+		lines, err := ReadLineSources(file, nums)
+		if err != nil {
+			continue // Skip if file can't be read
+		}
+		sources[file] = lines
+	}
+
+	for i := range *dumpList {
+		item := &(*dumpList)[i]
+
+		lineNum, err := strconv.Atoi(item.LineNumber)
+		if err != nil {
+			continue
+		}
+		if line, ok := sources[item.File][lineNum]; ok {
+			item.LineSource = line
 		}
 	}
 
 	return nil
-}
\ No newline at end of file
+}
@@ -0,0 +1,409 @@
+package main
+
+import (
+	"bufio"
+	"bytes"
+	"crypto/sha256"
+	"encoding/binary"
+	"encoding/hex"
+	"encoding/json"
+	"fmt"
+	"os"
+	"path/filepath"
+	"regexp"
+	"strconv"
+	"strings"
+	"sync"
+)
+
+const (
+	// FLASH_PAGE_SIZE is the unit used to diff firmware images (ATmega328P page size)
+	FLASH_PAGE_SIZE = 128
+	// MAX_FLASH_SIZE bounds the image built from a hex file (ATmega2560 has 256KB)
+	MAX_FLASH_SIZE = 256 * 1024
+	// DELTA_MAGIC prefixes binary frames carrying a page delta instead of a full hex file
+	DELTA_MAGIC = "WSDELTA1"
+	// HEX_RECORD_SIZE is the number of data bytes per record when re-encoding an image
+	HEX_RECORD_SIZE = 16
+)
+
+// DeltaHeader describes a page delta against the last image uploaded for a board
+type DeltaHeader struct {
+	Board    string `json:"board"`
+	Base     string `json:"base"`
+	Checksum string `json:"checksum"`
+	Size     int    `json:"size"`
+	PageSize int    `json:"pageSize"`
+	Pages    []int  `json:"pages"`
+}
+
+// ControlMessage is a JSON text message exchanged between the CLI, the server and the web client
+type ControlMessage struct {
+	Action   string `json:"action"`
+	Board    string `json:"board,omitempty"`
+	Checksum string `json:"checksum,omitempty"`
+	Ok       bool   `json:"ok,omitempty"`
+	Error    string `json:"error,omitempty"`
+}
+
+// FlashImage is the content of a hex file laid out by address.
+// Mask[i] is 1 when byte i is present in the hex file, so gaps are kept
+// out of the re-encoded file instead of turning into 0xFF data.
+type FlashImage struct {
+	Data []byte
+	Mask []byte
+}
+
+// Checksum returns the hex encoded SHA-256 of the image data and coverage
+func (img *FlashImage) Checksum() string {
+	h := sha256.New()
+	h.Write(img.Data)
+	h.Write(img.Mask)
+	return hex.EncodeToString(h.Sum(nil))
+}
+
+// ParseIntelHex decodes an Intel HEX file into a flash image
+func ParseIntelHex(data []byte) (*FlashImage, error) {
+	img := &FlashImage{}
+	var base uint32
+	eof := false
+
+	scanner := bufio.NewScanner(bytes.NewReader(data))
+	for lineNum := 1; scanner.Scan(); lineNum++ {
+		line := strings.TrimSpace(scanner.Text())
+		if line == "" {
+			continue
+		}
+		if line[0] != ':' || len(line) < 11 || len(line)%2 == 0 {
+			return nil, fmt.Errorf("invalid hex record at line %d", lineNum)
+		}
+
+		record, err := hex.DecodeString(line[1:])
+		if err != nil {
+			return nil, fmt.Errorf("invalid hex record at line %d: %v", lineNum, err)
+		}
+
+		length := int(record[0])
+		if len(record) != length+5 {
+			return nil, fmt.Errorf("invalid record length at line %d", lineNum)
+		}
+
+		var sum byte
+		for _, b := range record {
+			sum += b
+		}
+		if sum != 0 {
+			return nil, fmt.Errorf("checksum mismatch at line %d", lineNum)
+		}
+
+		addr := uint32(binary.BigEndian.Uint16(record[1:3]))
+		payload := record[4 : 4+length]
+
+		switch record[3] {
+		case 0x00: // data
+			start := int(base + addr)
+			end := start + length
+			if end > MAX_FLASH_SIZE {
+				return nil, fmt.Errorf("address 0x%X out of range at line %d", end, lineNum)
+			}
+			img.resize(end)
+			copy(img.Data[start:end], payload)
+			for i := start; i < end; i++ {
+				img.Mask[i] = 1
+			}
+		case 0x01: // end of file
+			eof = true
+		case 0x02: // extended segment address
+			if length != 2 {
+				return nil, fmt.Errorf("invalid segment address at line %d", lineNum)
+			}
+			base = uint32(binary.BigEndian.Uint16(payload)) << 4
+		case 0x04: // extended linear address
+			if length != 2 {
+				return nil, fmt.Errorf("invalid linear address at line %d", lineNum)
+			}
+			base = uint32(binary.BigEndian.Uint16(payload)) << 16
+		}
+
+		if eof {
+			break
+		}
+	}
+
+	if err := scanner.Err(); err != nil {
+		return nil, err
+	}
+	if !eof {
+		return nil, fmt.Errorf("missing end of file record")
+	}
+
+	return img, nil
+}
+
+// resize grows the image to size bytes, new bytes are erased flash not present in the file
+func (img *FlashImage) resize(size int) {
+	for len(img.Data) < size {
+		img.Data = append(img.Data, 0xFF)
+		img.Mask = append(img.Mask, 0)
+	}
+	img.Data = img.Data[:size]
+	img.Mask = img.Mask[:size]
+}
+
+// EncodeIntelHex encodes a flash image back to Intel HEX.
+// Every byte present in the original file is written, gaps are skipped.
+func EncodeIntelHex(img *FlashImage) []byte {
+	var out bytes.Buffer
+	var upper uint32
+
+	writeRecord := func(addr uint16, recType byte, payload []byte) {
+		record := make([]byte, 0, len(payload)+5)
+		record = append(record, byte(len(payload)), byte(addr>>8), byte(addr), recType)
+		record = append(record, payload...)
+
+		var sum byte
+		for _, b := range record {
+			sum += b
+		}
+		record = append(record, -sum)
+
+		out.WriteByte(':')
+		out.WriteString(strings.ToUpper(hex.EncodeToString(record)))
+		out.WriteByte('\n')
+	}
+
+	for start := 0; start < len(img.Data); {
+		if img.Mask[start] == 0 {
+			start++
+			continue
+		}
+
+		// Records hold up to HEX_RECORD_SIZE contiguous bytes and never cross a 64KB segment
+		end := start + 1
+		for end < len(img.Data) && end-start < HEX_RECORD_SIZE && img.Mask[end] == 1 && end&0xFFFF != 0 {
+			end++
+		}
+
+		if segment := uint32(start) >> 16; segment != upper {
+			upper = segment
+			writeRecord(0, 0x04, []byte{byte(segment >> 8), byte(segment)})
+		}
+		writeRecord(uint16(start), 0x00, img.Data[start:end])
+		start = end
+	}
+	writeRecord(0, 0x01, nil)
+
+	return out.Bytes()
+}
+
+// DiffPages returns the indexes of the pages that differ between two images
+func DiffPages(base, img *FlashImage, pageSize int) []int {
+	var pages []int
+
+	for start := 0; start < len(img.Data); start += pageSize {
+		end := start + pageSize
+		if end > len(img.Data) {
+			end = len(img.Data)
+		}
+		if end > len(base.Data) ||
+			!bytes.Equal(base.Data[start:end], img.Data[start:end]) ||
+			!bytes.Equal(base.Mask[start:end], img.Mask[start:end]) {
+			pages = append(pages, start/pageSize)
+		}
+	}
+
+	return pages
+}
+
+// EncodeDeltaFrame builds the binary frame for a page delta:
+// DELTA_MAGIC | uint32 header length | JSON header | changed pages (data then mask)
+func EncodeDeltaFrame(board string, base, img *FlashImage) ([]byte, DeltaHeader, error) {
+	header := DeltaHeader{
+		Board:    board,
+		Base:     base.Checksum(),
+		Checksum: img.Checksum(),
+		Size:     len(img.Data),
+		PageSize: FLASH_PAGE_SIZE,
+		Pages:    DiffPages(base, img, FLASH_PAGE_SIZE),
+	}
+
+	headerJson, err := json.Marshal(header)
+	if err != nil {
+		return nil, header, err
+	}
+
+	var frame bytes.Buffer
+	frame.WriteString(DELTA_MAGIC)
+	binary.Write(&frame, binary.BigEndian, uint32(len(headerJson)))
+	frame.Write(headerJson)
+
+	for _, page := range header.Pages {
+		start := page * FLASH_PAGE_SIZE
+		end := start + FLASH_PAGE_SIZE
+		if end > len(img.Data) {
+			end = len(img.Data)
+		}
+		frame.Write(img.Data[start:end])
+		frame.Write(img.Mask[start:end])
+	}
+
+	return frame.Bytes(), header, nil
+}
+
+// IsDeltaFrame reports whether a binary message carries a page delta
+func IsDeltaFrame(message []byte) bool {
+	return bytes.HasPrefix(message, []byte(DELTA_MAGIC))
+}
+
+// DecodeDeltaFrame splits a delta frame into its header and page payload
+func DecodeDeltaFrame(frame []byte) (DeltaHeader, []byte, error) {
+	var header DeltaHeader
+
+	if !IsDeltaFrame(frame) {
+		return header, nil, fmt.Errorf("not a delta frame")
+	}
+	rest := frame[len(DELTA_MAGIC):]
+	if len(rest) < 4 {
+		return header, nil, fmt.Errorf("truncated delta frame")
+	}
+	headerLen := int(binary.BigEndian.Uint32(rest[:4]))
+	rest = rest[4:]
+	if headerLen > len(rest) {
+		return header, nil, fmt.Errorf("truncated delta header")
+	}
+	if err := json.Unmarshal(rest[:headerLen], &header); err != nil {
+		return header, nil, fmt.Errorf("invalid delta header: %v", err)
+	}
+	if header.PageSize <= 0 || header.PageSize > MAX_FLASH_SIZE || header.Size < 0 || header.Size > MAX_FLASH_SIZE {
+		return header, nil, fmt.Errorf("invalid delta geometry")
+	}
+
+	return header, rest[headerLen:], nil
+}
+
+// ApplyDelta rebuilds the full image from the changed pages and the base image.
+// The result is verified against the checksum announced in the header.
+func ApplyDelta(header DeltaHeader, pages []byte, base *FlashImage) (*FlashImage, error) {
+	if base == nil || base.Checksum() != header.Base {
+		return nil, fmt.Errorf("base image mismatch for board %s", header.Board)
+	}
+
+	img := &FlashImage{
+		Data: append([]byte(nil), base.Data...),
+		Mask: append([]byte(nil), base.Mask...),
+	}
+	img.resize(header.Size)
+
+	pageCount := (header.Size + header.PageSize - 1) / header.PageSize
+	offset := 0
+	for _, page := range header.Pages {
+		if page < 0 || page >= pageCount {
+			return nil, fmt.Errorf("page %d out of range", page)
+		}
+		start := page * header.PageSize
+		end := start + header.PageSize
+		if end > header.Size {
+			end = header.Size
+		}
+		n := end - start
+		if offset+2*n > len(pages) {
+			return nil, fmt.Errorf("truncated delta payload")
+		}
+		copy(img.Data[start:end], pages[offset:offset+n])
+		copy(img.Mask[start:end], pages[offset+n:offset+2*n])
+		offset += 2 * n
+	}
+
+	if img.Checksum() != header.Checksum {
+		return nil, fmt.Errorf("checksum mismatch after applying delta")
+	}
+
+	return img, nil
+}
+
+// BoardImageCache keeps the last image uploaded for each board (server side)
+type BoardImageCache struct {
+	mu     sync.Mutex
+	images map[string]*FlashImage
+}
+
+func NewBoardImageCache() *BoardImageCache {
+	return &BoardImageCache{
+		images: make(map[string]*FlashImage),
+	}
+}
+
+func (c *BoardImageCache) Get(board string) *FlashImage {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	return c.images[board]
+}
+
+func (c *BoardImageCache) Put(board string, img *FlashImage) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.images[board] = img
+}
+
+// Checksum returns the checksum of the cached image, or "" if there is none
+func (c *BoardImageCache) Checksum(board string) string {
+	img := c.Get(board)
+	if img == nil {
+		return ""
+	}
+	return img.Checksum()
+}
+
+var unsafeBoardChars = regexp.MustCompile(`[^A-Za-z0-9._-]`)
+
+// userCachePath returns a path inside the uploader's user cache directory
+func userCachePath(elem ...string) (string, error) {
+	cacheDir, err := os.UserCacheDir()
+	if err != nil {
+		return "", err
+	}
+	return filepath.Join(append([]string{cacheDir, "websim-webuploader"}, elem...)...), nil
+}
+
+// writeCacheFile atomically replaces a cache file (optional, no errors)
+func writeCacheFile(path string, data []byte) {
+	if err := os.MkdirAll(filepath.Dir(path), 0755); err != nil {
+		return
+	}
+	tmpPath := path + "." + strconv.Itoa(os.Getpid()) + ".tmp"
+	if err := os.WriteFile(tmpPath, data, 0644); err != nil {
+		return
+	}
+	os.Rename(tmpPath, path)
+}
+
+// boardImagePath returns where the CLI keeps the last hex file sent for a board
+func boardImagePath(board string) (string, error) {
+	return userCachePath("boards", unsafeBoardChars.ReplaceAllString(board, "_")+".hex")
+}
+
+// loadBoardImage reads the cached image for a board (optional, nil if missing)
+func loadBoardImage(board string) *FlashImage {
+	path, err := boardImagePath(board)
+	if err != nil {
+		return nil
+	}
+	data, err := os.ReadFile(path)
+	if err != nil {
+		return nil
+	}
+	img, err := ParseIntelHex(data)
+	if err != nil {
+		return nil
+	}
+	return img
+}
+
+// saveBoardImage stores the hex file accepted by the server for a board (optional, no errors)
+func saveBoardImage(board string, hexData []byte) {
+	path, err := boardImagePath(board)
+	if err != nil {
+		return
+	}
+	writeCacheFile(path, hexData)
+}
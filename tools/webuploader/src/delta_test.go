@@ -0,0 +1,337 @@
+package main
+
+import (
+	"bytes"
+	"encoding/binary"
+	"encoding/hex"
+	"encoding/json"
+	"strings"
+	"testing"
+)
+
+// hexRecord builds one Intel HEX record line
+func hexRecord(addr uint16, recType byte, payload []byte) string {
+	record := append([]byte{byte(len(payload)), byte(addr >> 8), byte(addr), recType}, payload...)
+	var sum byte
+	for _, b := range record {
+		sum += b
+	}
+	record = append(record, -sum)
+	return ":" + strings.ToUpper(hex.EncodeToString(record)) + "\n"
+}
+
+// seq returns n bytes counting up from start
+func seq(start byte, n int) []byte {
+	data := make([]byte, n)
+	for i := range data {
+		data[i] = start + byte(i)
+	}
+	return data
+}
+
+// fill returns n copies of b
+func fill(b byte, n int) []byte {
+	return bytes.Repeat([]byte{b}, n)
+}
+
+var hexEOF = hexRecord(0, 0x01, nil)
+
+func TestIntelHexRoundTrip(t *testing.T) {
+	tests := []struct {
+		name    string
+		hex     string
+		present []int // addresses expected in the image
+		missing []int // addresses expected to be gaps
+	}{
+		{
+			name:    "contiguous",
+			hex:     hexRecord(0x0000, 0x00, seq(0, 16)) + hexRecord(0x0010, 0x00, seq(16, 16)) + hexEOF,
+			present: []int{0x00, 0x1F},
+		},
+		{
+			name:    "short last record",
+			hex:     hexRecord(0x0000, 0x00, seq(0, 16)) + hexRecord(0x0010, 0x00, seq(16, 5)) + hexEOF,
+			present: []int{0x14},
+		},
+		{
+			name:    "gap",
+			hex:     hexRecord(0x0000, 0x00, seq(0, 16)) + hexRecord(0x0100, 0x00, seq(1, 8)) + hexEOF,
+			present: []int{0x0F, 0x100, 0x107},
+			missing: []int{0x10, 0xFF},
+		},
+		{
+			name:    "0xFF data",
+			hex:     hexRecord(0x0000, 0x00, fill(0xFF, 16)) + hexRecord(0x0010, 0x00, []byte{0x01, 0xFF, 0xFF, 0x02}) + hexEOF,
+			present: []int{0x00, 0x0F, 0x11, 0x13},
+			missing: []int{0x14},
+		},
+		{
+			name: "extended linear address",
+			hex: hexRecord(0xFFF0, 0x00, seq(0, 16)) +
+				hexRecord(0, 0x04, []byte{0x00, 0x01}) +
+				hexRecord(0x0000, 0x00, seq(16, 16)) + hexEOF,
+			present: []int{0xFFF0, 0xFFFF, 0x10000, 0x1000F},
+		},
+		{
+			name:    "record across 64KB",
+			hex:     hexRecord(0xFFF8, 0x00, seq(0, 8)) + hexRecord(0, 0x04, []byte{0x00, 0x01}) + hexRecord(0x0000, 0x00, fill(0xFF, 8)) + hexEOF,
+			present: []int{0xFFF8, 0x10007},
+		},
+		{
+			name:    "extended segment address",
+			hex:     hexRecord(0, 0x02, []byte{0x10, 0x00}) + hexRecord(0x0000, 0x00, seq(0, 4)) + hexEOF,
+			present: []int{0x10000, 0x10003},
+			missing: []int{0x00},
+		},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			img, err := ParseIntelHex([]byte(tt.hex))
+			if err != nil {
+				t.Fatalf("parse: %v", err)
+			}
+			for _, addr := range tt.present {
+				if addr >= len(img.Mask) || img.Mask[addr] != 1 {
+					t.Errorf("address 0x%X missing from image", addr)
+				}
+			}
+			for _, addr := range tt.missing {
+				if addr < len(img.Mask) && img.Mask[addr] != 0 {
+					t.Errorf("address 0x%X should be a gap", addr)
+				}
+			}
+
+			encoded := EncodeIntelHex(img)
+			again, err := ParseIntelHex(encoded)
+			if err != nil {
+				t.Fatalf("parse re-encoded: %v\n%s", err, encoded)
+			}
+			if !bytes.Equal(img.Data, again.Data) || !bytes.Equal(img.Mask, again.Mask) {
+				t.Fatalf("round trip changed the image\n%s", encoded)
+			}
+
+			// Re-encoding is stable
+			if reencoded := EncodeIntelHex(again); !bytes.Equal(encoded, reencoded) {
+				t.Errorf("encoding is not stable:\n%s\n%s", encoded, reencoded)
+			}
+		})
+	}
+}
+
+func TestEncodeIntelHexLinearAddress(t *testing.T) {
+	hexData := hexRecord(0xFFF8, 0x00, seq(0, 8)) + hexRecord(0, 0x04, []byte{0x00, 0x01}) + hexRecord(0x0000, 0x00, seq(8, 8)) + hexEOF
+	img, err := ParseIntelHex([]byte(hexData))
+	if err != nil {
+		t.Fatalf("parse: %v", err)
+	}
+
+	encoded := string(EncodeIntelHex(img))
+	if !strings.Contains(encoded, hexRecord(0, 0x04, []byte{0x00, 0x01})) {
+		t.Errorf("missing extended linear address record:\n%s", encoded)
+	}
+
+	// Data records never run past the end of their 64KB segment
+	for _, line := range strings.Split(strings.TrimSpace(encoded), "\n") {
+		record, _ := hex.DecodeString(line[1:])
+		if record[3] == 0x00 && int(binary.BigEndian.Uint16(record[1:3]))+int(record[0]) > 0x10000 {
+			t.Errorf("data record crosses the 64KB boundary: %s", line)
+		}
+	}
+}
+
+func TestParseIntelHexErrors(t *testing.T) {
+	tests := []struct {
+		name string
+		hex  string
+	}{
+		{"missing eof", hexRecord(0x0000, 0x00, seq(0, 4))},
+		{"bad checksum", ":0400000000010203F0\n" + hexEOF},
+		{"bad length", ":0500000000010203F6\n" + hexEOF},
+		{"not a record", "0400000000010203F6\n" + hexEOF},
+		{"bad digits", ":04000000000102ZZF6\n" + hexEOF},
+		{"out of range", hexRecord(0, 0x04, []byte{0x00, 0x04}) + hexRecord(0x0000, 0x00, seq(0, 4)) + hexEOF},
+		{"bad linear address", hexRecord(0, 0x04, []byte{0x01}) + hexEOF},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			if _, err := ParseIntelHex([]byte(tt.hex)); err == nil {
+				t.Errorf("expected an error")
+			}
+		})
+	}
+}
+
+// imageFromHex parses a hex file or fails the test
+func imageFromHex(t *testing.T, hexData string) *FlashImage {
+	t.Helper()
+	img, err := ParseIntelHex([]byte(hexData))
+	if err != nil {
+		t.Fatalf("parse: %v", err)
+	}
+	return img
+}
+
+// hexBlock encodes data as consecutive 16-byte records starting at address 0
+func hexBlock(data []byte) string {
+	var out strings.Builder
+	for start := 0; start < len(data); start += 16 {
+		end := start + 16
+		if end > len(data) {
+			end = len(data)
+		}
+		out.WriteString(hexRecord(uint16(start), 0x00, data[start:end]))
+	}
+	out.WriteString(hexEOF)
+	return out.String()
+}
+
+func TestDeltaRoundTrip(t *testing.T) {
+	base := seq(0, 1024)
+
+	changed := append([]byte(nil), base...)
+	changed[130] = 0xAA
+	changed[900] = 0xFF
+
+	tests := []struct {
+		name  string
+		base  string
+		img   string
+		pages int // pages expected in the delta
+	}{
+		{"unchanged", hexBlock(base), hexBlock(base), 0},
+		{"same size", hexBlock(base), hexBlock(changed), 2},
+		{"smaller", hexBlock(base), hexBlock(base[:700]), 0}, // only the size changes
+		{"smaller and changed", hexBlock(base), hexBlock(changed[:700]), 1},
+		{"larger", hexBlock(base), hexBlock(append(append([]byte(nil), base...), fill(0xFF, 300)...)), 3},
+		{"larger with gap", hexBlock(base), strings.TrimSuffix(hexBlock(base), hexEOF) + hexRecord(0x0800, 0x00, seq(7, 16)) + hexEOF, 9},
+		{"from empty", hexEOF, hexBlock(base[:200]), 2},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			baseImg := imageFromHex(t, tt.base)
+			img := imageFromHex(t, tt.img)
+
+			frame, header, err := EncodeDeltaFrame("uno", baseImg, img)
+			if err != nil {
+				t.Fatalf("encode: %v", err)
+			}
+			if len(header.Pages) != tt.pages {
+				t.Errorf("pages = %v, want %d pages", header.Pages, tt.pages)
+			}
+			if !IsDeltaFrame(frame) {
+				t.Fatalf("frame without delta magic")
+			}
+
+			decoded, pages, err := DecodeDeltaFrame(frame)
+			if err != nil {
+				t.Fatalf("decode: %v", err)
+			}
+			if decoded.Board != "uno" || decoded.Size != len(img.Data) {
+				t.Errorf("decoded header = %+v", decoded)
+			}
+
+			result, err := ApplyDelta(decoded, pages, baseImg)
+			if err != nil {
+				t.Fatalf("apply: %v", err)
+			}
+			if !bytes.Equal(result.Data, img.Data) || !bytes.Equal(result.Mask, img.Mask) {
+				t.Fatalf("applied image differs from the new image")
+			}
+			if !bytes.Equal(EncodeIntelHex(result), EncodeIntelHex(img)) {
+				t.Errorf("re-encoded hex differs")
+			}
+		})
+	}
+}
+
+// deltaFrame assembles a frame from a raw header and payload
+func deltaFrame(headerJson []byte, payload []byte) []byte {
+	var frame bytes.Buffer
+	frame.WriteString(DELTA_MAGIC)
+	binary.Write(&frame, binary.BigEndian, uint32(len(headerJson)))
+	frame.Write(headerJson)
+	frame.Write(payload)
+	return frame.Bytes()
+}
+
+func TestDecodeDeltaFrameErrors(t *testing.T) {
+	header, _ := json.Marshal(DeltaHeader{Board: "uno", Size: 256, PageSize: FLASH_PAGE_SIZE})
+
+	tests := []struct {
+		name  string
+		frame []byte
+	}{
+		{"empty", nil},
+		{"no magic", []byte("not a delta frame")},
+		{"magic only", []byte(DELTA_MAGIC)},
+		{"short length", append([]byte(DELTA_MAGIC), 0, 0)},
+		{"truncated header", deltaFrame(header, nil)[:len(DELTA_MAGIC)+4+len(header)-1]},
+		{"header length past end", append([]byte(DELTA_MAGIC), 0xFF, 0xFF, 0xFF, 0xFF, '{', '}')},
+		{"invalid json", deltaFrame([]byte("{board"), nil)},
+		{"zero page size", deltaFrame([]byte(`{"size":256,"pageSize":0}`), nil)},
+		{"negative size", deltaFrame([]byte(`{"size":-1,"pageSize":128}`), nil)},
+		{"size out of range", deltaFrame([]byte(`{"size":1000000,"pageSize":128}`), nil)},
+		{"page size out of range", deltaFrame([]byte(`{"size":256,"pageSize":1000000000000}`), nil)},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			if _, _, err := DecodeDeltaFrame(tt.frame); err == nil {
+				t.Errorf("expected an error")
+			}
+		})
+	}
+}
+
+func TestApplyDeltaErrors(t *testing.T) {
+	base := imageFromHex(t, hexBlock(seq(0, 256)))
+	img := imageFromHex(t, hexBlock(seq(1, 256)))
+	page := func(n int) []byte {
+		return append(append([]byte(nil), img.Data[:n]...), img.Mask[:n]...)
+	}
+
+	valid := DeltaHeader{
+		Board:    "uno",
+		Base:     base.Checksum(),
+		Checksum: img.Checksum(),
+		Size:     256,
+		PageSize: FLASH_PAGE_SIZE,
+		Pages:    []int{0, 1},
+	}
+	payload := append(append(append([]byte(nil), img.Data[:128]...), img.Mask[:128]...), append(append([]byte(nil), img.Data[128:]...), img.Mask[128:]...)...)
+	if _, err := ApplyDelta(valid, payload, base); err != nil {
+		t.Fatalf("valid delta rejected: %v", err)
+	}
+
+	tests := []struct {
+		name    string
+		modify  func(h *DeltaHeader)
+		payload []byte
+		base    *FlashImage
+	}{
+		{"no base", nil, payload, nil},
+		{"base mismatch", func(h *DeltaHeader) { h.Base = img.Checksum() }, payload, base},
+		{"negative page", func(h *DeltaHeader) { h.Pages = []int{-1} }, page(128), base},
+		{"page past size", func(h *DeltaHeader) { h.Pages = []int{2} }, page(128), base},
+		{"page overflow", func(h *DeltaHeader) { h.Pages = []int{1 << 62} }, page(128), base},
+		{"truncated payload", nil, payload[:len(payload)-1], base},
+		{"empty payload", nil, nil, base},
+		{"checksum mismatch", func(h *DeltaHeader) { h.Pages = []int{0} }, page(128), base},
+	}
+
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			header := valid
+			header.Pages = append([]int(nil), valid.Pages...)
+			if tt.modify != nil {
+				tt.modify(&header)
+			}
+			if _, err := ApplyDelta(header, tt.payload, tt.base); err == nil {
+				t.Errorf("expected an error")
+			}
+		})
+	}
+}
@@ -1,9 +1,11 @@
 package main
 
 import (
+	"encoding/json"
 	"fmt"
 	"log"
 	"net"
+	"net/http"
 	"os"
 	"os/exec"
 	"time"
@@ -11,17 +13,79 @@ import (
 
 const PORT = 8887
 
-func isServerRunning() bool {
-	// Try to connect to see if server is already running
-	listener, err := net.Listen("tcp", fmt.Sprintf(":%d", PORT))
+const (
+	// Backoff bounds while waiting for a freshly started daemon
+	READY_TIMEOUT     = 10 * time.Second
+	READY_MIN_BACKOFF = 20 * time.Millisecond
+	READY_MAX_BACKOFF = 500 * time.Millisecond
+	// PROBE_TIMEOUT bounds each connect and health request of a probe
+	PROBE_TIMEOUT = 500 * time.Millisecond
+)
+
+// version is set at build time (-X main.version)
+var version = "dev"
+
+type serverState int
+
+const (
+	serverDown    serverState = iota // nothing listening on the port
+	serverReady                      // our daemon is listening
+	serverBusy                       // port open but no answer yet (daemon starting, slow machine)
+	serverForeign                    // port busy with something else
+)
+
+// probeServer checks the daemon health endpoint and tells our daemon apart
+// from another process holding the port. The health status carries the
+// features the daemon supports (empty for daemons older than /health).
+// Only a complete HTTP reply that is not ours reports serverForeign.
+func probeServer() (serverState, HealthStatus) {
+	// A refused or timed out connect means nothing is listening yet
+	// (connecting to a closed port can take seconds on Windows)
+	conn, err := net.DialTimeout("tcp", fmt.Sprintf("localhost:%d", PORT), PROBE_TIMEOUT)
 	if err != nil {
-		// Port is already in use, server is probably running
-		return true
+		return serverDown, HealthStatus{}
+	}
+	conn.Close()
+
+	client := http.Client{Timeout: PROBE_TIMEOUT}
+	resp, err := client.Get(fmt.Sprintf("http://localhost:%d%s", PORT, HEALTH_PATH))
+	if err != nil {
+		return serverBusy, HealthStatus{}
+	}
+	defer resp.Body.Close()
+
+	var health HealthStatus
+	if resp.StatusCode == http.StatusOK && json.NewDecoder(resp.Body).Decode(&health) == nil && health.Service == SERVICE_NAME {
+		return serverReady, health
 	}
 
-	// Close the listener if we were able to bind to the port
-	listener.Close()
-	return false
+	// Daemons older than the health endpoint answer every path with a websocket handshake error
+	if resp.Header.Get("Sec-Websocket-Version") != "" {
+		return serverReady, HealthStatus{}
+	}
+
+	return serverForeign, HealthStatus{}
+}
+
+// waitForServer polls the health endpoint with bounded exponential backoff
+// until the daemon answers or the port turns out to be taken
+func waitForServer(timeout time.Duration) (serverState, HealthStatus) {
+	deadline := time.Now().Add(timeout)
+	backoff := READY_MIN_BACKOFF
+
+	for {
+		state, health := probeServer()
+		waiting := state == serverDown || state == serverBusy
+		if !waiting || time.Now().Add(backoff).After(deadline) {
+			return state, health
+		}
+
+		time.Sleep(backoff)
+		backoff *= 2
+		if backoff > READY_MAX_BACKOFF {
+			backoff = READY_MAX_BACKOFF
+		}
+	}
 }
 
 func startServerInBackground() {
@@ -55,15 +119,28 @@ func main() {
 	}
 
 	// Check if server is already running
-	serverRunning := isServerRunning()
+	state, health := probeServer()
 
-	// If server is not running, start it in background
-	if !serverRunning {
+	// If server is not running, start it in background and wait until it is listening
+	if state == serverDown {
 		fmt.Println("[uploader] Starting server in background...")
 		startServerInBackground()
+		state, health = waitForServer(READY_TIMEOUT)
+	} else if state == serverBusy {
+		// Something accepted the connection but did not answer in time, give it a chance
+		state, health = waitForServer(READY_TIMEOUT)
+	}
 
-		// Wait a moment for server to start
-		time.Sleep(2 * time.Second)
+	switch state {
+	case serverForeign:
+		fmt.Printf("[uploader] ###### ERROR: port %d is in use by another application\n", PORT)
+		os.Exit(1)
+	case serverDown:
+		fmt.Printf("[uploader] ###### ERROR: server did not start within %v\n", READY_TIMEOUT)
+		os.Exit(1)
+	case serverBusy:
+		fmt.Printf("[uploader] ###### ERROR: port %d is not answering within %v\n", PORT, READY_TIMEOUT)
+		os.Exit(1)
 	}
 
 	// Parse arguments and handle client operations
@@ -72,18 +149,10 @@ func main() {
 	// If file path provided, try to send file
 	if filePath != "" {
 		client := NewWebSocketClient(PORT)
+		client.deltaUpload = health.HasFeature(FEATURE_DELTA_UPLOAD)
 		err := client.SendFile(filePath, board)
 		if err != nil {
 			fmt.Printf("Error sending file: %v\n", err)
-			// If this failed and we just started the server, give it a bit more time
-			if !serverRunning {
-				fmt.Println("Waiting for server to fully start...")
-				time.Sleep(3 * time.Second)
-				err = client.SendFile(filePath, board)
-				if err != nil {
-					fmt.Printf("Second attempt failed: %v\n", err)
-				}
-			}
 		} else {
 			// Handle legacy debug board functionality
 			err := client.HandleLegacyDebugBoard(args, filePath)
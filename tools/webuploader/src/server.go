@@ -1,12 +1,15 @@
 package main
 
 import (
+	"encoding/json"
 	"fmt"
 	"log"
+	"net"
 	"net/http"
 	"os"
 	"os/signal"
 	"strings"
+	"sync"
 	"syscall"
 	"time"
 	"webuploader/src/utils"
@@ -16,29 +19,190 @@ import (
 
 const (
 	WEB_SIGNATURE = `{"from":"web"`
+	HEALTH_PATH   = "/health"
+	SERVICE_NAME  = "websim-webuploader"
+
+	// FEATURE_DELTA_UPLOAD is advertised on the health endpoint when the server
+	// answers delta-query and accepts WSDELTA1 frames
+	FEATURE_DELTA_UPLOAD = "delta-upload"
 )
 
+// HealthStatus is returned by the health endpoint so the CLI can tell
+// our daemon apart from another process using the port
+type HealthStatus struct {
+	Service  string   `json:"service"`
+	Version  string   `json:"version"`
+	Pid      int      `json:"pid"`
+	Features []string `json:"features"`
+}
+
+// HasFeature reports whether the server advertised a protocol feature
+func (h HealthStatus) HasFeature(feature string) bool {
+	for _, f := range h.Features {
+		if f == feature {
+			return true
+		}
+	}
+	return false
+}
+
 var upgrader = websocket.Upgrader{
 	CheckOrigin: func(r *http.Request) bool {
 		return true // Allow connections from any origin
 	},
 }
 
+const (
+	// SEND_QUEUE_SIZE is how many messages may be pending for a client before it is dropped
+	SEND_QUEUE_SIZE = 64
+	// WRITE_TIMEOUT bounds a single write to a client connection
+	WRITE_TIMEOUT = 10 * time.Second
+	// WEB_CLIENT_TIMEOUT is how long an upload waits for the web browser to connect
+	WEB_CLIENT_TIMEOUT = 30 * time.Second
+)
+
+type outMessage struct {
+	messageType int
+	data        []byte
+	closeAfter  bool
+}
+
+// wsClient is a connection with its own write queue. Only its writePump
+// goroutine writes to the connection, so a slow client never blocks others.
+type wsClient struct {
+	conn      *websocket.Conn
+	board     string // selected with change-board, only used by the reader goroutine
+	send      chan outMessage
+	done      chan struct{}
+	closeOnce sync.Once
+}
+
+func newWSClient(conn *websocket.Conn) *wsClient {
+	return &wsClient{
+		conn: conn,
+		send: make(chan outMessage, SEND_QUEUE_SIZE),
+		done: make(chan struct{}),
+	}
+}
+
+// enqueue queues a message without blocking. A client whose queue is full
+// is too slow to keep up and gets disconnected.
+func (c *wsClient) enqueue(msg outMessage) bool {
+	select {
+	case <-c.done:
+		return false
+	default:
+	}
+
+	select {
+	case c.send <- msg:
+		return true
+	default:
+		log.Printf("Dropping slow client %s: send queue full", c.conn.RemoteAddr())
+		c.close()
+		return false
+	}
+}
+
+func (c *wsClient) sendText(message string) bool {
+	return c.enqueue(outMessage{messageType: websocket.TextMessage, data: []byte(message)})
+}
+
+// closeAfterSend closes the connection once every queued message was written
+func (c *wsClient) closeAfterSend() {
+	c.enqueue(outMessage{closeAfter: true})
+}
+
+func (c *wsClient) close() {
+	c.closeOnce.Do(func() {
+		close(c.done)
+		c.conn.Close()
+	})
+}
+
+func (c *wsClient) writePump() {
+	for {
+		select {
+		case <-c.done:
+			return
+		case msg := <-c.send:
+			if msg.closeAfter {
+				c.conn.WriteControl(websocket.CloseMessage,
+					websocket.FormatCloseMessage(websocket.CloseNormalClosure, ""),
+					time.Now().Add(WRITE_TIMEOUT))
+				c.close()
+				return
+			}
+
+			c.conn.SetWriteDeadline(time.Now().Add(WRITE_TIMEOUT))
+			err := c.conn.WriteMessage(msg.messageType, msg.data)
+			if err != nil {
+				log.Printf("Error writing to client %s: %v", c.conn.RemoteAddr(), err)
+				c.close()
+				return
+			}
+		}
+	}
+}
+
 type WSServer struct {
-	webClient *websocket.Conn
-	clients   map[*websocket.Conn]bool
+	mu        sync.Mutex
+	webClient *wsClient
+	webReady  chan struct{} // closed when a web client is connected
+	clients   map[*wsClient]bool
+	images    *BoardImageCache
 }
 
 func NewWSServer() *WSServer {
 	return &WSServer{
-		clients: make(map[*websocket.Conn]bool),
+		webReady: make(chan struct{}),
+		clients:  make(map[*wsClient]bool),
+		images:   NewBoardImageCache(),
+	}
+}
+
+func (ws *WSServer) register(client *wsClient) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	ws.clients[client] = true
+}
+
+func (ws *WSServer) unregister(client *wsClient) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	delete(ws.clients, client)
+
+	// Clean up web client reference if this was the web client
+	if ws.webClient == client {
+		ws.webClient = nil
+		ws.webReady = make(chan struct{})
+	}
+}
+
+// setWebClient records the web browser connection and wakes uploads waiting for it
+func (ws *WSServer) setWebClient(client *wsClient) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	if ws.webClient == client {
+		return
 	}
+	if ws.webClient == nil {
+		close(ws.webReady)
+	}
+	ws.webClient = client
+}
+
+// getWebClient returns the web client, or nil and a channel closed once one connects
+func (ws *WSServer) getWebClient() (*wsClient, <-chan struct{}) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	return ws.webClient, ws.webReady
 }
 
 // handleWebSocket manages WebSocket connections from both web and CLI clients.
 // It upgrades HTTP connections to WebSocket protocol, maintains client connections,
 // and routes messages between clients. The function:
-// - Adds new connections to the clients map
+// - Adds new connections to the clients registry, each with its own write queue
 // - Identifies web clients vs CLI clients based on URL parameters
 // - Launches the web interface if a CLI client connects without a web client present
 // - Processes incoming text and binary messages
@@ -49,23 +213,26 @@ func (ws *WSServer) handleWebSocket(w http.ResponseWriter, r *http.Request) {
 		log.Printf("Failed to upgrade connection: %v", err)
 		return
 	}
-	defer conn.Close()
 
-	ws.clients[conn] = true
-	defer delete(ws.clients, conn)
+	client := newWSClient(conn)
+	defer client.close()
+	go client.writePump()
+
+	ws.register(client)
+	defer ws.unregister(client)
 
 	// Send welcome message
-	conn.WriteMessage(websocket.TextMessage, []byte("Welcome to the WebSIM server!"))
+	client.sendText("Welcome to the WebSIM server!")
 
 	// Check if this is a web client connection
 	uri := r.URL.String()
 	if strings.Contains(uri, "from=web") {
-		ws.webClient = conn
+		ws.setWebClient(client)
 		log.Printf("Web client connected from %s", conn.RemoteAddr())
 	} else {
 		// CLI connection
-		if ws.webClient == nil {
-			conn.WriteMessage(websocket.TextMessage, []byte("###### WARN: NO WEB Client connected !! opening https://websim-arduino.web.app"))
+		if webClient, _ := ws.getWebClient(); webClient == nil {
+			client.sendText("###### WARN: NO WEB Client connected !! opening https://websim-arduino.web.app")
 			err := utils.OpenURL("https://websim-arduino.web.app")
 			if err != nil {
 				fmt.Print("[uploader] Error openning browser")
@@ -84,87 +251,166 @@ func (ws *WSServer) handleWebSocket(w http.ResponseWriter, r *http.Request) {
 
 		switch messageType {
 		case websocket.TextMessage:
-			ws.handleTextMessage(conn, string(message))
+			ws.handleTextMessage(client, string(message))
 		case websocket.BinaryMessage:
-			ws.handleBinaryMessage(conn, message)
+			ws.handleBinaryMessage(client, message)
 		}
 	}
-
-	// Clean up web client reference if this was the web client
-	if conn == ws.webClient {
-		ws.webClient = nil
-	}
 }
 
-func (ws *WSServer) handleTextMessage(sender *websocket.Conn, message string) {
+func (ws *WSServer) handleTextMessage(sender *wsClient, message string) {
 	log.Printf("Received text message: %s", message)
 
+	// Control messages are decoded once; anything else is relayed as is
+	var cmd ControlMessage
+	json.Unmarshal([]byte(message), &cmd)
+
+	switch cmd.Action {
+	case "change-board":
+		// Board used to key the image cache for this connection's uploads
+		sender.board = cmd.Board
+	case "delta-query":
+		// Delta handshake is answered here and never relayed
+		reply, _ := json.Marshal(ControlMessage{
+			Action:   "delta-base",
+			Board:    cmd.Board,
+			Checksum: ws.images.Checksum(cmd.Board),
+		})
+		sender.sendText(string(reply))
+		return
+	}
+
 	// Broadcast to all clients except sender
 	ws.broadcast(message, sender)
 
 	// Check if this establishes the web client connection
 	if strings.Contains(message, WEB_SIGNATURE) {
-		ws.webClient = sender
+		ws.setWebClient(sender)
 	}
 }
 
-func (ws *WSServer) handleBinaryMessage(sender *websocket.Conn, message []byte) {
+func (ws *WSServer) handleBinaryMessage(sender *wsClient, message []byte) {
 	log.Printf("Received binary message of size: %d bytes", len(message))
 
-	// Wait for web client connection for up to 10 seconds
-	if ws.webClient == nil {
-		sender.WriteMessage(websocket.TextMessage, []byte("Waiting for web browser to connect (timeout: 10s)..."))
-
-		timeout := time.After(30 * time.Second)
-		ticker := time.NewTicker(500 * time.Millisecond)
-		defer ticker.Stop()
-
-		for ws.webClient == nil {
-			select {
-			case <-ticker.C:
-				// Check if web client connected
-				if ws.webClient != nil {
-					sender.WriteMessage(websocket.TextMessage, []byte("Web browser client connected !"))
-					break
-				}
-			case <-timeout:
-				sender.WriteMessage(websocket.TextMessage, []byte("###### ERROR: Timed out waiting for web browser client"))
-				return
+	board := sender.board
+
+	// Rebuild the full image from a page delta, the web client always gets a hex file
+	var image *FlashImage
+	if IsDeltaFrame(message) {
+		header, pages, err := DecodeDeltaFrame(message)
+		if err == nil {
+			board = header.Board
+			image, err = ApplyDelta(header, pages, ws.images.Get(board))
+		}
+		if err == nil {
+			// Verify what is actually relayed, not only the rebuilt image
+			message = EncodeIntelHex(image)
+			if sent, parseErr := ParseIntelHex(message); parseErr != nil || sent.Checksum() != header.Checksum {
+				err = fmt.Errorf("re-encoded hex does not match the uploaded image")
 			}
 		}
-	}
-
-	// Send to web browser if connected
-	if ws.webClient != nil {
-		err := ws.webClient.WriteMessage(websocket.BinaryMessage, message)
 		if err != nil {
-			log.Printf("Error sending to web client: %v", err)
-			sender.WriteMessage(websocket.TextMessage, []byte("###### WARN: Failed to send to web client"))
+			log.Printf("Rejected delta upload: %v", err)
+			reply, _ := json.Marshal(ControlMessage{Action: "delta-result", Board: board, Error: err.Error()})
+			sender.sendText(string(reply))
+			return
 		}
+		log.Printf("Applied delta for board %s: %d pages", board, len(header.Pages))
+	} else if board != "" {
+		image, _ = ParseIntelHex(message)
 	}
 
 	// Close CLI connection after sending file
-	sender.Close()
+	defer sender.closeAfterSend()
+
+	// Wait until the web client connects, without polling
+	webClient, webReady := ws.getWebClient()
+	if webClient == nil {
+		sender.sendText(fmt.Sprintf("Waiting for web browser to connect (timeout: %v)...", WEB_CLIENT_TIMEOUT))
+
+		select {
+		case <-webReady:
+			webClient, _ = ws.getWebClient()
+			sender.sendText("Web browser client connected !")
+		case <-sender.done:
+			return
+		case <-time.After(WEB_CLIENT_TIMEOUT):
+			sender.sendText("###### ERROR: Timed out waiting for web browser client")
+			sendUploadResult(sender, board, fmt.Errorf("timed out waiting for web browser client"))
+			return
+		}
+	}
+
+	// Send to web browser if connected
+	if webClient == nil {
+		sender.sendText("###### WARN: Web client disconnected before upload")
+		sendUploadResult(sender, board, fmt.Errorf("web client disconnected"))
+		return
+	}
+	if !webClient.enqueue(outMessage{messageType: websocket.BinaryMessage, data: message}) {
+		log.Printf("Error sending to web client %s", webClient.conn.RemoteAddr())
+		sender.sendText("###### WARN: Failed to send to web client")
+		sendUploadResult(sender, board, fmt.Errorf("failed to send to web client"))
+		return
+	}
+
+	// The CLI only takes this image as its delta base after the ok reply
+	if board != "" && image != nil {
+		ws.images.Put(board, image)
+	}
+	sendUploadResult(sender, board, nil)
+}
+
+// sendUploadResult tells the CLI whether its upload was relayed to the web client
+func sendUploadResult(sender *wsClient, board string, err error) {
+	result := ControlMessage{Action: "upload-result", Board: board, Ok: err == nil}
+	if err != nil {
+		result.Error = err.Error()
+	}
+	reply, _ := json.Marshal(result)
+	sender.sendText(string(reply))
 }
 
-func (ws *WSServer) broadcast(message string, except *websocket.Conn) {
+// broadcast queues a message for every client except the sender; it never
+// waits on a client's connection
+func (ws *WSServer) broadcast(message string, except *wsClient) {
+	ws.mu.Lock()
+	targets := make([]*wsClient, 0, len(ws.clients))
 	for client := range ws.clients {
 		if client != except {
-			err := client.WriteMessage(websocket.TextMessage, []byte(message))
-			if err != nil {
-				log.Printf("Error broadcasting to client: %v", err)
-				client.Close()
-				delete(ws.clients, client)
-			}
+			targets = append(targets, client)
 		}
 	}
+	ws.mu.Unlock()
+
+	for _, client := range targets {
+		client.sendText(message)
+	}
+}
+
+// handleHealth reports that the daemon is up and accepting connections
+func handleHealth(w http.ResponseWriter, r *http.Request) {
+	w.Header().Set("Content-Type", "application/json")
+	json.NewEncoder(w).Encode(HealthStatus{
+		Service:  SERVICE_NAME,
+		Version:  version,
+		Pid:      os.Getpid(),
+		Features: []string{FEATURE_DELTA_UPLOAD},
+	})
 }
 
 func RunServer(port int) {
 	server := NewWSServer()
 
+	http.HandleFunc(HEALTH_PATH, handleHealth)
 	http.HandleFunc("/", server.handleWebSocket)
 
+	// Bind before announcing, the health endpoint answers as soon as we are listening
+	listener, err := net.Listen("tcp", fmt.Sprintf(":%d", port))
+	if err != nil {
+		log.Fatalf("Failed to listen on port %d: %v", port, err)
+	}
+
 	fmt.Printf("[uploader] Server started on port: %d\n", port)
 	fmt.Println("[uploader] Open: https://websim-arduino.web.app")
 
@@ -178,5 +424,5 @@ func RunServer(port int) {
 		os.Exit(0)
 	}()
 
-	log.Fatal(http.ListenAndServe(fmt.Sprintf(":%d", port), nil))
+	log.Fatal(http.Serve(listener, nil))
 }
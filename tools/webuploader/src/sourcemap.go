@@ -0,0 +1,212 @@
+package main
+
+import (
+	"bufio"
+	"bytes"
+	"crypto/sha256"
+	"debug/dwarf"
+	"debug/elf"
+	"encoding/hex"
+	"encoding/json"
+	"fmt"
+	"io"
+	"os"
+	"path/filepath"
+	"strings"
+)
+
+// LineEntry maps an address to a source line.
+// File is an index into SourceMap.Files.
+type LineEntry struct {
+	Addr uint64 `json:"addr"`
+	File int    `json:"file"`
+	Line int    `json:"line"`
+}
+
+// SourceMap is the address -> (file, line) table built from the ELF DWARF line table.
+// Entries keep the line table order (compile unit by compile unit), the same
+// order `avr-objdump -WL` prints them in.
+type SourceMap struct {
+	Digest  string      `json:"digest"`
+	Files   []string    `json:"files"`
+	Entries []LineEntry `json:"entries"`
+}
+
+// LoadSourceMap returns the source map of an ELF file. Source maps are cached on
+// disk, one entry per ELF path holding the digest of the ELF contents, so the
+// DWARF line table is only parsed for new builds and rebuilds replace the entry.
+func LoadSourceMap(elfFile string) (*SourceMap, error) {
+	data, err := os.ReadFile(elfFile)
+	if err != nil {
+		return nil, err
+	}
+	digest := fileDigest(data)
+
+	cachePath, cacheErr := sourceMapCachePath(elfFile)
+	if cacheErr == nil {
+		if sm := loadCachedSourceMap(cachePath, digest); sm != nil {
+			return sm, nil
+		}
+	}
+
+	sm, err := BuildSourceMap(data)
+	if err != nil {
+		return nil, err
+	}
+	sm.Digest = digest
+	if cacheErr == nil {
+		saveCachedSourceMap(cachePath, sm)
+	}
+
+	return sm, nil
+}
+
+// BuildSourceMap reads the DWARF line table of an ELF image
+func BuildSourceMap(data []byte) (*SourceMap, error) {
+	f, err := elf.NewFile(bytes.NewReader(data))
+	if err != nil {
+		return nil, fmt.Errorf("failed to open elf: %v", err)
+	}
+	defer f.Close()
+
+	d, err := f.DWARF()
+	if err != nil {
+		return nil, fmt.Errorf("failed to read dwarf: %v", err)
+	}
+
+	sm := &SourceMap{}
+	fileIndex := make(map[string]int)
+
+	r := d.Reader()
+	for {
+		ent, err := r.Next()
+		if err != nil {
+			return nil, fmt.Errorf("failed to read dwarf: %v", err)
+		}
+		if ent == nil {
+			break
+		}
+		if ent.Tag != dwarf.TagCompileUnit {
+			r.SkipChildren()
+			continue
+		}
+
+		lr, err := d.LineReader(ent)
+		if err != nil {
+			return nil, fmt.Errorf("failed to read line table: %v", err)
+		}
+		r.SkipChildren()
+		if lr == nil {
+			continue
+		}
+
+		var le dwarf.LineEntry
+		for {
+			err := lr.Next(&le)
+			if err == io.EOF {
+				break
+			}
+			if err != nil {
+				return nil, fmt.Errorf("failed to read line table: %v", err)
+			}
+
+			if le.EndSequence || le.File == nil {
+				continue
+			}
+
+			idx, ok := fileIndex[le.File.Name]
+			if !ok {
+				idx = len(sm.Files)
+				fileIndex[le.File.Name] = idx
+				sm.Files = append(sm.Files, le.File.Name)
+			}
+
+			sm.Entries = append(sm.Entries, LineEntry{Addr: le.Address, File: idx, Line: le.Line})
+		}
+	}
+
+	if len(sm.Entries) == 0 {
+		return nil, fmt.Errorf("no line information found")
+	}
+
+	return sm, nil
+}
+
+// ObjSourceMaps converts the index to the format previously parsed from `avr-objdump -WL`
+func (sm *SourceMap) ObjSourceMaps() []ObjSourceMap {
+	list := make([]ObjSourceMap, 0, len(sm.Entries))
+	for _, entry := range sm.Entries {
+		list = append(list, ObjSourceMap{
+			File:       sm.Files[entry.File],
+			LineNumber: fmt.Sprintf("%d", entry.Line),
+			Addr:       fmt.Sprintf("0x%x", entry.Addr),
+		})
+	}
+	return list
+}
+
+// fileDigest returns the hex encoded SHA-256 of a file content
+func fileDigest(data []byte) string {
+	sum := sha256.Sum256(data)
+	return hex.EncodeToString(sum[:])
+}
+
+// sourceMapCachePath returns the cache entry of an ELF file, keyed by its absolute path
+func sourceMapCachePath(elfFile string) (string, error) {
+	absPath, err := filepath.Abs(elfFile)
+	if err != nil {
+		return "", err
+	}
+	return userCachePath("sourcemaps", fileDigest([]byte(absPath))+".json")
+}
+
+func loadCachedSourceMap(path string, digest string) *SourceMap {
+	data, err := os.ReadFile(path)
+	if err != nil {
+		return nil
+	}
+	var sm SourceMap
+	if json.Unmarshal(data, &sm) != nil || sm.Digest != digest {
+		return nil
+	}
+	return &sm
+}
+
+// saveCachedSourceMap stores the source map on disk (optional, no errors)
+func saveCachedSourceMap(path string, sm *SourceMap) {
+	data, err := json.Marshal(sm)
+	if err != nil {
+		return
+	}
+	writeCacheFile(path, data)
+}
+
+// ReadLineSources reads the requested line numbers of a source file in a single pass,
+// stopping at the last requested line.
+func ReadLineSources(file string, lineNums []int) (map[int]string, error) {
+	wanted := make(map[int]bool, len(lineNums))
+	last := 0
+	for _, n := range lineNums {
+		wanted[n] = true
+		if n > last {
+			last = n
+		}
+	}
+
+	f, err := os.Open(file)
+	if err != nil {
+		return nil, err
+	}
+	defer f.Close()
+
+	sources := make(map[int]string, len(wanted))
+	scanner := bufio.NewScanner(f)
+	scanner.Buffer(make([]byte, 64*1024), 1024*1024)
+	for n := 1; n <= last && scanner.Scan(); n++ {
+		if wanted[n] {
+			sources[n] = strings.TrimSuffix(scanner.Text(), "\r")
+		}
+	}
+
+	return sources, scanner.Err()
+}